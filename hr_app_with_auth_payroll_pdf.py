@@ -14,75 +14,100 @@ This version: New Dashboard UI with colorful icon tiles similar to the provided
 
 import streamlit as st
 import sqlite3
+import base64
+import html
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
 import pandas as pd
 import numpy as np
 from datetime import date, datetime
-from passlib.hash import pbkdf2_sha256
-from fpdf import FPDF
 
-# Try to import plotly; if not available, fall back to Streamlit charts
-try:
-    import plotly.express as px
-    PLOTLY_AVAILABLE = True
-except Exception:
-    PLOTLY_AVAILABLE = False
+# plotly is optional and imported lazily; without it we fall back to Streamlit charts
+@st.cache_resource
+def plotly_express():
+    try:
+        import plotly.express as px
+        return px
+    except Exception:
+        return None
 
 # ---------------------------
 # Database setup
 # ---------------------------
-conn = sqlite3.connect('hr_system_auth.db', check_same_thread=False)
+DB_PATH = 'hr_system_auth.db'
+
+def get_conn():
+    # One connection per browser session, kept in session_state across reruns:
+    # sessions no longer share a single handle (WAL lets them read concurrently),
+    # and the per-connection statement cache survives between reruns. Script
+    # threads are short-lived in Streamlit, so a thread-local would reconnect on
+    # nearly every rerun.
+    c = st.session_state.get('_db_conn')
+    if c is None:
+        # sqlite3 reuses prepared statements keyed on the SQL text, so the inline
+        # query strings are parsed once per connection; size the cache for all of them.
+        c = sqlite3.connect(DB_PATH, check_same_thread=False, cached_statements=256)
+        # WAL lets readers run alongside a writer and turns commits into appends;
+        # synchronous=NORMAL is durable enough in WAL mode and skips extra fsyncs.
+        c.executescript('''
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=NORMAL;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA mmap_size=268435456;
+        PRAGMA cache_size=-65536;
+        ''')
+        st.session_state['_db_conn'] = c
+    return c
+
+conn = get_conn()
 cur = conn.cursor()
 
-cur.execute('''
+MONTHS = ['January','February','March','April','May','June','July','August','September','October','November','December']
+
+TABLES_SQL = '''
 CREATE TABLE IF NOT EXISTS users(
     user_id INTEGER PRIMARY KEY AUTOINCREMENT,
     username TEXT UNIQUE,
     password_hash TEXT,
     role TEXT,
     emp_id INTEGER
-)
-''')
+);
 
-cur.execute('''
 CREATE TABLE IF NOT EXISTS employees(
     emp_id INTEGER PRIMARY KEY AUTOINCREMENT,
     name TEXT,
     department TEXT,
     designation TEXT,
     basic_salary REAL DEFAULT 0
-)
-''')
+);
 
-cur.execute('''
 CREATE TABLE IF NOT EXISTS performance(
     perf_id INTEGER PRIMARY KEY AUTOINCREMENT,
     emp_id INTEGER,
     rating INTEGER,
     remarks TEXT,
     date TEXT
-)
-''')
+);
 
-cur.execute('''
 CREATE TABLE IF NOT EXISTS leaves(
     leave_id INTEGER PRIMARY KEY AUTOINCREMENT,
     emp_id INTEGER,
     leave_type TEXT,
     days INTEGER,
     date TEXT
-)
-''')
+);
 
-cur.execute('''
 CREATE TABLE IF NOT EXISTS attendance(
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     emp_id INTEGER,
     date TEXT,
     status TEXT
-)
-''')
+);
 
-cur.execute('''
 CREATE TABLE IF NOT EXISTS payroll(
     payroll_id INTEGER PRIMARY KEY AUTOINCREMENT,
     emp_id INTEGER,
@@ -93,145 +118,460 @@ CREATE TABLE IF NOT EXISTS payroll(
     allowances REAL,
     deductions REAL,
     net_pay REAL,
-    generated_on TEXT
-)
-''')
-
-conn.commit()
+    generated_on TEXT,
+    month_num INTEGER
+);
+'''
+
+INDEXES_SQL = '''
+-- emp_id joins/filters used by the UI queries
+CREATE INDEX IF NOT EXISTS idx_users_emp ON users(emp_id);
+CREATE INDEX IF NOT EXISTS idx_performance_emp ON performance(emp_id);
+CREATE INDEX IF NOT EXISTS idx_leaves_emp ON leaves(emp_id);
+CREATE INDEX IF NOT EXISTS idx_attendance_emp ON attendance(emp_id);
+-- serves the dashboard's "recent payrolls" ORDER BY generated_on DESC LIMIT without a sort
+CREATE INDEX IF NOT EXISTS idx_payroll_generated_on ON payroll(generated_on);
+-- created last: its presence marks a fully set-up (and migrated) schema
+CREATE INDEX IF NOT EXISTS idx_payroll_emp_year_month_num ON payroll(emp_id, year DESC, month_num DESC);
+'''
+
+def ensure_schema():
+    # warm start: the last object created below already exists, nothing to do
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type='index' AND name='idx_payroll_emp_year_month_num'")
+    if cur.fetchone():
+        return
+    cur.executescript(TABLES_SQL)
+    # Older databases store only the month name; add and backfill month_num so
+    # payroll history can be ordered chronologically (and from an index).
+    if 'month_num' not in [c[1] for c in cur.execute('PRAGMA table_info(payroll)').fetchall()]:
+        cur.execute('ALTER TABLE payroll ADD COLUMN month_num INTEGER')
+        cur.executemany('UPDATE payroll SET month_num=? WHERE month=?', [(i + 1, m) for i, m in enumerate(MONTHS)])
+    cur.executescript(INDEXES_SQL)
+    conn.commit()
+ensure_schema()
 
 # ---------------------------
 # Helper functions
 # ---------------------------
-def hash_password(password: str) -> str:
-    return pbkdf2_sha256.hash(password)
+# The script re-executes on every Streamlit rerun, so this is today's date for the
+# current rerun; the insert helpers stamp rows with it instead of asking each time.
+TODAY_ISO = date.today().isoformat()
+
+# Password hashes use the stdlib (OpenSSL-backed) PBKDF2 and are stored as
+# pbkdf2_sha256$<rounds>$<b64 salt>$<b64 key>. Rows hashed earlier by passlib
+# ($pbkdf2-sha256$<rounds>$<ab64 salt>$<ab64 key>) are parsed natively as well.
+# Same cost as passlib's default; repeat logins skip PBKDF2 via the auth cache below.
+PBKDF2_ROUNDS = 29000
+
+def _b64(raw: bytes) -> str:
+    return base64.b64encode(raw).decode('ascii')
+
+def _ab64_decode(text: str) -> bytes:
+    # passlib's "adapted" base64: '.' instead of '+', no padding
+    text = text.replace('.', '+')
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+def _parse_hash(hashed: str):
+    # (rounds, salt, key) for a stored hash
+    if hashed.startswith('$pbkdf2-sha256$'):
+        rounds, salt, dk = hashed[len('$pbkdf2-sha256$'):].split('$')
+        return int(rounds), _ab64_decode(salt), _ab64_decode(dk)
+    scheme, rounds, salt, dk = hashed.split('$')
+    if scheme != 'pbkdf2_sha256':
+        raise ValueError(f'unsupported hash scheme: {scheme}')
+    return int(rounds), base64.b64decode(salt), base64.b64decode(dk)
+
+def hash_password(password: str, rounds: int = PBKDF2_ROUNDS) -> str:
+    salt = os.urandom(16)
+    dk = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, rounds)
+    return f"pbkdf2_sha256${rounds}${_b64(salt)}${_b64(dk)}"
 
 def verify_password(password: str, hashed: str) -> bool:
     try:
-        return pbkdf2_sha256.verify(password, hashed)
+        rounds, salt, dk = _parse_hash(hashed)
+        return hmac.compare_digest(hashlib.pbkdf2_hmac('sha256', password.encode(), salt, rounds), dk)
     except Exception:
         return False
 
+def needs_rehash(hashed: str) -> bool:
+    # passlib-format rows and rows hashed below the current cost get rewritten on login
+    try:
+        rounds, _, _ = _parse_hash(hashed)
+    except Exception:
+        return False
+    return not hashed.startswith('pbkdf2_sha256$') or rounds < PBKDF2_ROUNDS
+
 def create_user(username, password, role='employee', emp_id=None):
+    # check the name first so a collision doesn't pay for a PBKDF2 hash;
+    # the UNIQUE constraint below still catches a concurrent insert
+    if user_exists(username):
+        return False
     pw_hash = hash_password(password)
     try:
         cur.execute('INSERT INTO users(username, password_hash, role, emp_id) VALUES(?,?,?,?)',
                     (username, pw_hash, role, emp_id))
-        conn.commit()
+        _commit()
         return True
     except sqlite3.IntegrityError:
+        # the session's connection outlives this rerun; don't leave the failed
+        # INSERT's transaction (and its write lock) open
+        conn.rollback()
         return False
 
+# Successful logins are remembered for a short while, keyed on a fast SHA3 digest
+# of the password, so repeated logins skip the (deliberately slow) PBKDF2 verify.
+# An entry holds the password_hash it was verified against and only counts while
+# the users row still carries that hash, so a password change invalidates it even
+# if a login that started before the change writes the entry afterwards.
+AUTH_CACHE_TTL = 300
+AUTH_CACHE_SIZE = 1024
+
+@st.cache_resource
+def _auth_cache():
+    # kept in cache_resource so it survives Streamlit reruns of this script
+    return threading.Lock(), OrderedDict()
+
+def _forget_auth(username):
+    lock, cache = _auth_cache()
+    with lock:
+        for key in [k for k in cache if k[0] == username]:
+            del cache[key]
+
 def authenticate(username, password):
     cur.execute('SELECT user_id, password_hash, role, emp_id FROM users WHERE username=?', (username,))
     row = cur.fetchone()
     if not row:
         return None
     user_id, pw_hash, role, emp_id = row
-    if verify_password(password, pw_hash):
-        return {'user_id': user_id, 'username': username, 'role': role, 'emp_id': emp_id}
-    return None
+    lock, cache = _auth_cache()
+    key = (username, hashlib.sha3_256(password.encode()).digest())
+    with lock:
+        hit = cache.get(key)
+        if hit and (hit[0] <= time.monotonic() or hit[1] != pw_hash):
+            del cache[key]
+            hit = None
+        if hit:
+            cache.move_to_end(key)
+    if not hit:
+        if not verify_password(password, pw_hash):
+            return None
+        if needs_rehash(pw_hash):
+            # never lower the cost: a stronger passlib row keeps its round count
+            rounds = max(_parse_hash(pw_hash)[0], PBKDF2_ROUNDS)
+            pw_hash = hash_password(password, rounds)
+            cur.execute('UPDATE users SET password_hash=? WHERE user_id=?', (pw_hash, user_id))
+            _commit()
+        with lock:
+            cache[key] = (time.monotonic() + AUTH_CACHE_TTL, pw_hash)
+            cache.move_to_end(key)
+            if len(cache) > AUTH_CACHE_SIZE:
+                cache.popitem(last=False)
+    return {'user_id': user_id, 'username': username, 'role': role, 'emp_id': emp_id}
+
+def _query_df(sql, params=()):
+    # straight cursor fetch into a DataFrame; cheaper than pd.read_sql_query's
+    # dtype/date handling for the small result sets these pages show
+    cur.execute(sql, params)
+    return pd.DataFrame(cur.fetchall(), columns=[d[0] for d in cur.description])
+
+# Read-mostly queries are cached across reruns; every mutation below clears them.
+@st.cache_data(ttl=30)
+def _dashboard_counts():
+    cur.execute('SELECT (SELECT COUNT(*) FROM employees), (SELECT COUNT(*) FROM leaves), '
+                '(SELECT COUNT(*) FROM attendance), (SELECT COUNT(*) FROM payroll)')
+    return cur.fetchone()
+
+@st.cache_data(ttl=30)
+def _employees_cached():
+    return _query_df('SELECT * FROM employees')
+
+@st.cache_data(ttl=30)
+def _payroll_cached():
+    # explicit columns: month_num is a sort key, not something to show
+    return _query_df('SELECT p.payroll_id, p.emp_id, p.month, p.year, p.basic, p.hra, p.allowances, p.deductions, '
+                     'p.net_pay, p.generated_on, e.name FROM payroll p JOIN employees e ON p.emp_id = e.emp_id')
+
+@st.cache_data(ttl=30)
+def _department_headcount():
+    return _query_df('SELECT department, COUNT(*) AS count FROM employees '
+                     'WHERE department IS NOT NULL GROUP BY department')
+
+@st.cache_data(ttl=30)
+def _recent_payrolls(limit=8):
+    return _query_df('SELECT p.generated_on, p.net_pay FROM payroll p JOIN employees e ON p.emp_id = e.emp_id '
+                     'ORDER BY p.generated_on DESC LIMIT ?', (limit,))
+
+@st.cache_data(ttl=30)
+def _performance_view():
+    return _query_df('SELECT p.*, e.name FROM performance p JOIN employees e ON p.emp_id=e.emp_id')
+
+@st.cache_data(ttl=30)
+def _leaves_view():
+    return _query_df('SELECT l.*, e.name FROM leaves l JOIN employees e ON l.emp_id=e.emp_id')
+
+@st.cache_data(ttl=30)
+def _attendance_view():
+    return _query_df('SELECT a.*, e.name FROM attendance a JOIN employees e ON a.emp_id=e.emp_id')
+
+@st.cache_data(ttl=30)
+def _users_view(limit, offset):
+    return _query_df('SELECT u.user_id, u.username, u.role, u.emp_id, e.name FROM users u LEFT JOIN employees e ON u.emp_id=e.emp_id '
+                     'ORDER BY u.user_id LIMIT ? OFFSET ?', (limit, offset))
+
+# per-employee views, cached per emp_id
+@st.cache_data(ttl=30)
+def _employee_performance(emp_id):
+    return _query_df('SELECT * FROM performance WHERE emp_id=?', (emp_id,))
+
+@st.cache_data(ttl=30)
+def _employee_payrolls(emp_id):
+    return _query_df('SELECT payroll_id, emp_id, month, year, basic, hra, allowances, deductions, net_pay, generated_on '
+                     'FROM payroll WHERE emp_id=? ORDER BY year DESC, month_num DESC', (emp_id,))
+
+def _clear_read_caches():
+    _dashboard_counts.clear()
+    _employees_cached.clear()
+    _payroll_cached.clear()
+    _department_headcount.clear()
+    _recent_payrolls.clear()
+    _performance_view.clear()
+    _leaves_view.clear()
+    _attendance_view.clear()
+    _users_view.clear()
+    _employee_performance.clear()
+    _employee_payrolls.clear()
+
+# Mutations commit through _commit(), which also drops the cached reads above.
+def _commit():
+    conn.commit()
+    _clear_read_caches()
 
 def add_employee(name, dept, desig, basic_salary):
     cur.execute('INSERT INTO employees(name, department, designation, basic_salary) VALUES(?,?,?,?)',
                 (name, dept, desig, basic_salary))
-    conn.commit()
+    _commit()
     return cur.lastrowid
 
 def update_employee(emp_id, name, dept, desig, basic_salary):
     cur.execute('UPDATE employees SET name=?, department=?, designation=?, basic_salary=? WHERE emp_id=?',
                 (name, dept, desig, basic_salary, emp_id))
-    conn.commit()
+    _commit()
 
 def delete_employee(emp_id):
     cur.execute('DELETE FROM employees WHERE emp_id=?', (emp_id,))
-    conn.commit()
+    _commit()
 
 def get_employees_df():
-    return pd.read_sql_query('SELECT * FROM employees', conn)
+    return _employees_cached()
+
+def get_performance_df():
+    return _performance_view()
+
+def get_leaves_df():
+    return _leaves_view()
+
+def get_attendance_df():
+    return _attendance_view()
+
+def _fetch_dict(sql, params=()):
+    cur.execute(sql, params)
+    row = cur.fetchone()
+    if row is None:
+        return None
+    return dict(zip([d[0] for d in cur.description], row))
+
+def get_employee(emp_id):
+    return _fetch_dict('SELECT emp_id, name, department, designation, basic_salary FROM employees WHERE emp_id=?',
+                       (emp_id,))
+
+def get_payroll(payroll_id):
+    return _fetch_dict('SELECT p.*, e.name FROM payroll p JOIN employees e ON p.emp_id = e.emp_id WHERE p.payroll_id=?',
+                       (payroll_id,))
+
+def get_employee_performance_df(emp_id):
+    return _employee_performance(emp_id)
+
+USERS_PAGE_SIZE = 50
+
+def get_users_df(page=1):
+    return _users_view(USERS_PAGE_SIZE, (page - 1) * USERS_PAGE_SIZE)
+
+def get_user_count():
+    cur.execute('SELECT COUNT(*) FROM users')
+    return cur.fetchone()[0]
+
+def user_exists(username):
+    cur.execute('SELECT 1 FROM users WHERE username=?', (username,))
+    return cur.fetchone() is not None
+
+def get_payroll_ids():
+    # newest first, for the payslip dropdown; ids only, the picked row is fetched by get_payroll
+    cur.execute('SELECT p.payroll_id FROM payroll p JOIN employees e ON p.emp_id = e.emp_id '
+                'ORDER BY p.payroll_id DESC')
+    return [r[0] for r in cur.fetchall()]
+
+def get_payroll_month_df(month, year):
+    return _query_df('SELECT p.*, e.name FROM payroll p JOIN employees e ON p.emp_id = e.emp_id '
+                     'WHERE p.month=? AND p.year=?', (month, year))
+
+def get_employee_ids():
+    cur.execute('SELECT emp_id FROM employees ORDER BY emp_id')
+    return [r[0] for r in cur.fetchall()]
 
 def add_performance(emp_id, rating, remarks):
     cur.execute('INSERT INTO performance(emp_id, rating, remarks, date) VALUES(?,?,?,?)',
-                (emp_id, rating, remarks, str(date.today())))
-    conn.commit()
+                (emp_id, rating, remarks, TODAY_ISO))
+    _commit()
 
 def add_leave(emp_id, leave_type, days):
     cur.execute('INSERT INTO leaves(emp_id, leave_type, days, date) VALUES(?,?,?,?)',
-                (emp_id, leave_type, days, str(date.today())))
-    conn.commit()
+                (emp_id, leave_type, days, TODAY_ISO))
+    _commit()
 
 def add_attendance(emp_id, status):
     cur.execute('INSERT INTO attendance(emp_id, date, status) VALUES(?,?,?)',
-                (emp_id, str(date.today()), status))
-    conn.commit()
+                (emp_id, TODAY_ISO, status))
+    _commit()
+
+# Bulk variants: one executemany and one commit for all rows.
+def add_leave_bulk(rows):
+    # rows: iterable of (emp_id, leave_type, days)
+    cur.executemany('INSERT INTO leaves(emp_id, leave_type, days, date) VALUES(?,?,?,?)',
+                    ((emp_id, leave_type, days, TODAY_ISO) for emp_id, leave_type, days in rows))
+    _commit()
+
+def add_attendance_bulk(rows):
+    # rows: iterable of (emp_id, status)
+    cur.executemany('INSERT INTO attendance(emp_id, date, status) VALUES(?,?,?)',
+                    ((emp_id, TODAY_ISO, status) for emp_id, status in rows))
+    _commit()
 
 def generate_payroll(emp_id, month, year, basic, hra_pct=0.2, allowances=0, deductions=0):
     hra = basic * hra_pct
     gross = basic + hra + allowances
     net = gross - deductions
     generated_on = datetime.now().isoformat()
-    cur.execute('''INSERT INTO payroll(emp_id, month, year, basic, hra, allowances, deductions, net_pay, generated_on)
-                   VALUES(?,?,?,?,?,?,?,?,?)''', (emp_id, month, year, basic, hra, allowances, deductions, net, generated_on))
-    conn.commit()
+    cur.execute('''INSERT INTO payroll(emp_id, month, month_num, year, basic, hra, allowances, deductions, net_pay, generated_on)
+                   VALUES(?,?,?,?,?,?,?,?,?,?)''',
+                (emp_id, month, MONTHS.index(month) + 1, year, basic, hra, allowances, deductions, net, generated_on))
+    _commit()
     return cur.lastrowid
 
+def generate_payroll_bulk(month, year, emp_ids, basics, hra_pcts=0.2, allowances=0, deductions=0):
+    # Array arguments are per employee; scalars apply to everyone. Same arithmetic as
+    # generate_payroll, done in one NumPy pass and written with one executemany/commit.
+    emp_ids = np.asarray(emp_ids)
+    basics, hra_pcts, allowances, deductions = np.broadcast_arrays(
+        *(np.asarray(a, dtype=float) for a in (basics, hra_pcts, allowances, deductions)))
+    hras = basics * hra_pcts
+    nets = basics + hras + allowances - deductions
+    generated_on = datetime.now().isoformat()
+    n = len(emp_ids)
+    rows = zip(emp_ids.tolist(), [month] * n, [MONTHS.index(month) + 1] * n, [year] * n, basics.tolist(), hras.tolist(),
+               allowances.tolist(), deductions.tolist(), nets.tolist(), [generated_on] * n)
+    cur.executemany('''INSERT INTO payroll(emp_id, month, month_num, year, basic, hra, allowances, deductions, net_pay, generated_on)
+                       VALUES(?,?,?,?,?,?,?,?,?,?)''', rows)
+    _commit()
+    return n
+
 def get_payroll_df():
-    return pd.read_sql_query('SELECT p.*, e.name FROM payroll p JOIN employees e ON p.emp_id = e.emp_id', conn)
+    return _payroll_cached()
 
 def get_payroll_for_employee(emp_id):
-    return pd.read_sql_query('SELECT * FROM payroll WHERE emp_id=? ORDER BY year DESC, month DESC', conn, params=(emp_id,))
+    return _employee_payrolls(emp_id)
 
 def update_user_password(username, new_password):
     pw_hash = hash_password(new_password)
     cur.execute('UPDATE users SET password_hash=? WHERE username=?', (pw_hash, username))
-    conn.commit()
+    _commit()
+    _forget_auth(username)
 
 # ---------------------------
 # Create DEFAULT ADMIN (if none)
 # ---------------------------
 def ensure_default_admin():
-    cur.execute('SELECT COUNT(*) FROM users')
-    count = cur.fetchone()[0]
-    if count == 0:
+    cur.execute('SELECT 1 FROM users LIMIT 1')
+    if cur.fetchone() is None:
         create_user('Admin', 'admin@123', role='admin')
         print('Default admin created: Admin / admin@123')
-ensure_default_admin()
+# once per browser session, not on every rerun
+if not st.session_state.get('_admin_ok'):
+    ensure_default_admin()
+    st.session_state['_admin_ok'] = True
 
 # ---------------------------
 # PDF generation (payslip)
 # ---------------------------
-class PayslipPDF(FPDF):
-    def header(self):
-        self.set_font('Arial', 'B', 14)
-        self.cell(0, 10, 'Company XYZ - Payslip', ln=True, align='C')
-        self.ln(5)
-
-    def employee_block(self, emp):
-        self.set_font('Arial', '', 11)
-        self.cell(40, 8, f"Employee ID: {emp.get('emp_id')}", ln=0)
-        self.cell(0, 8, f"Name: {emp.get('name')}", ln=1)
-        self.cell(40, 8, f"Department: {emp.get('department')}", ln=0)
-        self.cell(0, 8, f"Designation: {emp.get('designation')}", ln=1)
-        self.ln(3)
-
-    def payroll_block(self, pay):
-        self.set_font('Arial', '', 11)
-        self.cell(40, 8, f"Month: {pay.get('month')} {pay.get('year')}", ln=1)
-        self.cell(60, 8, f"Basic: {pay.get('basic')}", ln=1)
-        self.cell(60, 8, f"HRA: {pay.get('hra')}", ln=1)
-        self.cell(60, 8, f"Allowances: {pay.get('allowances')}", ln=1)
-        self.cell(60, 8, f"Deductions: {pay.get('deductions')}", ln=1)
-        self.set_font('Arial', 'B', 12)
-        self.cell(60, 10, f"Net Pay: {pay.get('net_pay')}", ln=1)
+# fpdf is imported on first use; most sessions never build a payslip
+@st.cache_resource
+def payslip_pdf_class():
+    from fpdf import FPDF
+
+    class PayslipPDF(FPDF):
+        def header(self):
+            self.set_font('Arial', 'B', 14)
+            self.cell(0, 10, 'Company XYZ - Payslip', ln=True, align='C')
+            self.ln(5)
+
+        def footer(self):
+            # drawn by fpdf while closing each page, with auto page break suspended;
+            # a footer cell placed from the page body would spill onto a blank page
+            self.set_y(-30)
+            self.set_font('Arial', 'I', 8)
+            self.cell(0, 10, f"Generated on {self.generated}", align='C')
+
+        def employee_block(self, emp):
+            self.set_font('Arial', '', 11)
+            self.cell(40, 8, f"Employee ID: {emp.get('emp_id')}", ln=0)
+            self.cell(0, 8, f"Name: {emp.get('name')}", ln=1)
+            self.cell(40, 8, f"Department: {emp.get('department')}", ln=0)
+            self.cell(0, 8, f"Designation: {emp.get('designation')}", ln=1)
+            self.ln(3)
+
+        def payroll_block(self, pay):
+            self.set_font('Arial', '', 11)
+            self.cell(40, 8, f"Month: {pay.get('month')} {pay.get('year')}", ln=1)
+            self.cell(60, 8, f"Basic: {pay.get('basic')}", ln=1)
+            self.cell(60, 8, f"HRA: {pay.get('hra')}", ln=1)
+            self.cell(60, 8, f"Allowances: {pay.get('allowances')}", ln=1)
+            self.cell(60, 8, f"Deductions: {pay.get('deductions')}", ln=1)
+            self.set_font('Arial', 'B', 12)
+            self.cell(60, 10, f"Net Pay: {pay.get('net_pay')}", ln=1)
+
+    return PayslipPDF
+
+def _render_payslips(pdf_class, rows) -> bytes:
+    # rows: iterable of (emp_row, payroll_row); one document, one page per payslip
+    # Raises UnicodeEncodeError for text outside latin-1 (the core PDF fonts' range).
+    pdf = pdf_class()
+    pdf.generated = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    for emp_row, payroll_row in rows:
+        pdf.add_page()
+        pdf.employee_block(emp_row)
+        pdf.payroll_block(payroll_row)
+    return pdf.output(dest='S').encode('latin-1')
+
+def create_payslips_pdf(rows) -> bytes:
+    return _render_payslips(payslip_pdf_class(), rows)
 
 def create_payslip_pdf(emp_row: dict, payroll_row: dict) -> bytes:
-    pdf = PayslipPDF()
-    pdf.add_page()
-    pdf.employee_block(emp_row)
-    pdf.payroll_block(payroll_row)
-    pdf.set_y(-30)
-    pdf.set_font('Arial', 'I', 8)
-    pdf.cell(0, 10, f"Generated on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", align='C')
-    return pdf.output(dest='S').encode('latin-1')
+    return create_payslips_pdf([(emp_row, payroll_row)])
+
+PAYSLIP_MEMO_SIZE = 8
+
+def payslip_pdf(emp_row: dict, payroll_row: dict) -> bytes:
+    # The last few rendered payslips are remembered per session, so reruns while
+    # the user looks at the same payslip reuse the PDF instead of building it again.
+    # A render that raises is not stored and is retried on the next rerun.
+    memo = st.session_state.setdefault('_payslip_memo', OrderedDict())
+    key = (payroll_row['payroll_id'], tuple(sorted(emp_row.items())))
+    if key in memo:
+        memo.move_to_end(key)
+        return memo[key]
+    memo[key] = data = create_payslip_pdf(emp_row, payroll_row)
+    if len(memo) > PAYSLIP_MEMO_SIZE:
+        memo.popitem(last=False)
+    return data
 
 # ---------------------------
 # Safe rerun helper
@@ -245,6 +585,53 @@ def safe_rerun():
         except Exception:
             st.session_state['_force_rerun'] = not st.session_state.get('_force_rerun', False)
 
+# ---------------------------
+# Dashboard tile HTML
+# ---------------------------
+def render_tile(icon, title, val, css):
+    # kept free of blank lines: a blank line would end the markdown HTML block
+    value_html = f'<div class="t-sub">{html.escape(val)}</div>' if val else ''
+    sub = 'Total / Recent' if val else ''
+    return (
+        '<div class="tile">'
+        '<div style="display:flex;justify-content:space-between;align-items:center;">'
+        '<div style="display:flex;gap:12px;align-items:center;">'
+        f'<div class="icon {css}" style="box-shadow: 0 6px 14px rgba(0,0,0,0.35);">{icon}</div>'
+        f'<div><div class="t-title">{html.escape(title)}</div><div class="small-muted">{sub}</div></div>'
+        '</div>'
+        f'<div style="text-align:right;">{value_html}</div>'
+        '</div>'
+        '</div>'
+    )
+
+# tiles data: (icon emoji, title, count placeholder or '', color class)
+DASHBOARD_TILES = [
+    ("📝","Requests & Tasks","","bg-1"),
+    ("👥","Employees","{emp_count}","bg-2"),
+    ("💬","Vibe","","bg-3"),
+    ("💸","Reimbursement","","bg-4"),
+    ("💰","Compensation","","bg-5"),
+    ("📋","Attendance","{attend_count}","bg-6"),
+    ("🏖️","Leave","{leave_count}","bg-1"),
+    ("📂","HR Documents","","bg-2"),
+    ("🔍","Recruitment","","bg-3"),
+    ("📅","Calendar","","bg-4"),
+    ("📈","Performance","","bg-5"),
+    ("📁","Project","","bg-6"),
+    ("🛎️","Helpdesk","","bg-1"),
+    ("✈️","Travel","","bg-2"),
+    ("🏆","Recognition","","bg-3"),
+    ("⏱️","Time Sheets","","bg-4"),
+    ("📊","Reports","","bg-5"),
+    ("🧾","Reports Builder","","bg-6"),
+]
+
+@st.cache_resource
+def tile_grid_template():
+    # rendered once per process; a str.format template over the count placeholders
+    tiles_html = ''.join(render_tile(icon, title, val, css) for icon, title, val, css in DASHBOARD_TILES)
+    return f'<div class="tile-grid">{tiles_html}</div>'
+
 # ---------------------------
 # Streamlit UI + Styling
 # ---------------------------
@@ -335,69 +722,21 @@ choice = st.sidebar.selectbox('Menu', menu_options)
 if choice == 'Dashboard':
     st.title("Dashboard")
     # fetch counts
-    emp_count = pd.read_sql_query('SELECT COUNT(*) as c FROM employees', conn)['c'][0]
-    leave_count = pd.read_sql_query('SELECT COUNT(*) as c FROM leaves', conn)['c'][0]
-    attend_count = pd.read_sql_query('SELECT COUNT(*) as c FROM attendance', conn)['c'][0]
-    payroll_count = pd.read_sql_query('SELECT COUNT(*) as c FROM payroll', conn)['c'][0]
-
-    # tiles data: (icon emoji, title, count/value, color class)
-    tiles = [
-        ("📝","Requests & Tasks","","bg-1"),
-        ("👥","Employees", str(emp_count),"bg-2"),
-        ("💬","Vibe","","bg-3"),
-        ("💸","Reimbursement","","bg-4"),
-        ("💰","Compensation","","bg-5"),
-        ("📋","Attendance", str(attend_count),"bg-6"),
-        ("🏖️","Leave", str(leave_count),"bg-1"),
-        ("📂","HR Documents","","bg-2"),
-        ("🔍","Recruitment","","bg-3"),
-        ("📅","Calendar","","bg-4"),
-        ("📈","Performance","","bg-5"),
-        ("📁","Project","","bg-6"),
-        ("🛎️","Helpdesk","","bg-1"),
-        ("✈️","Travel","","bg-2"),
-        ("🏆","Recognition","","bg-3"),
-        ("⏱️","Time Sheets","","bg-4"),
-        ("📊","Reports","","bg-5"),
-        ("🧾","Reports Builder","","bg-6"),
-    ]
-
-    # render tiles in responsive grid
-    st.markdown('<div class="tile-grid">', unsafe_allow_html=True)
-    for icon, title, val, css in tiles:
-        # show actionable counts for those we have values for
-        value_html = f'<div class="t-sub">{val}</div>' if val else ''
-        # create tile
-        tile_html = f'''
-            <div class="tile">
-                <div style="display:flex;justify-content:space-between;align-items:center;">
-                    <div style="display:flex;gap:12px;align-items:center;">
-                        <div class="icon {css}" style="box-shadow: 0 6px 14px rgba(0,0,0,0.35);">
-                            {icon}
-                        </div>
-                        <div>
-                            <div class="t-title">{title}</div>
-                            <div class="small-muted">{ "" if val=="" else "Total / Recent" }</div>
-                        </div>
-                    </div>
-                    <div style="text-align:right;">
-                        {value_html}
-                    </div>
-                </div>
-            </div>
-        '''
-        st.markdown(tile_html, unsafe_allow_html=True)
-    st.markdown('</div>', unsafe_allow_html=True)
+    emp_count, leave_count, attend_count, payroll_count = _dashboard_counts()
+
+    # only the count placeholders are filled in per rerun
+    st.markdown(tile_grid_template().format(emp_count=emp_count, attend_count=attend_count,
+                                            leave_count=leave_count), unsafe_allow_html=True)
 
     st.markdown("---")
     # optionally add a small charts row below for quick insights
     col1, col2 = st.columns(2)
     with col1:
         st.subheader("Headcount by Department")
-        emp_df = get_employees_df()
-        if not emp_df.empty:
-            dept_counts = emp_df.groupby('department')['emp_id'].count().reset_index().rename(columns={'emp_id':'count'})
-            if PLOTLY_AVAILABLE:
+        dept_counts = _department_headcount()
+        px = plotly_express()
+        if not dept_counts.empty:
+            if px is not None:
                 fig = px.bar(dept_counts, x='department', y='count', text='count', height=320)
                 fig.update_layout(margin=dict(l=10,r=10,t=40,b=10))
                 st.plotly_chart(fig, use_container_width=True)
@@ -408,11 +747,10 @@ if choice == 'Dashboard':
 
     with col2:
         st.subheader("Payrolls / Recent")
-        payroll_df = get_payroll_df()
-        if not payroll_df.empty:
-            payroll_df['generated_on_dt'] = pd.to_datetime(payroll_df['generated_on'], errors='coerce')
-            recent = payroll_df.sort_values('generated_on_dt', ascending=False).head(8)
-            if PLOTLY_AVAILABLE:
+        recent = _recent_payrolls()
+        if not recent.empty:
+            recent['generated_on_dt'] = pd.to_datetime(recent['generated_on'], errors='coerce')
+            if px is not None:
                 fig2 = px.line(recent, x='generated_on_dt', y='net_pay', markers=True, height=320)
                 fig2.update_layout(margin=dict(l=10,r=10,t=40,b=10))
                 st.plotly_chart(fig2, use_container_width=True)
@@ -457,65 +795,64 @@ elif choice == 'Employees':
         if not emp_id:
             st.info('No employee profile linked to your user. Contact admin.')
         else:
-            df = get_employees_df()
-            row = df[df['emp_id'] == emp_id]
-            if row.empty:
+            emp = get_employee(emp_id)
+            if emp is None:
                 st.error('Employee record not found')
             else:
-                st.table(row.T)
+                st.table(pd.DataFrame([emp]).T)
 
 # --- Performance ---
 elif choice == 'Performance':
     st.title('Performance Reviews')
     if user['role'] == 'admin':
-        df_emp = get_employees_df()
-        emp_choice = st.selectbox('Employee', df_emp['emp_id'].tolist())
+        emp_choice = st.selectbox('Employee', get_employee_ids())
         rating = st.slider('Rating', 1, 5, 3)
         remarks = st.text_area('Remarks')
         if st.button('Submit Review'):
             add_performance(emp_choice, rating, remarks)
             st.success('Review submitted')
         st.subheader('All Reviews')
-        st.dataframe(pd.read_sql_query('SELECT p.*, e.name FROM performance p JOIN employees e ON p.emp_id=e.emp_id', conn))
+        st.dataframe(get_performance_df())
     else:
         emp_id = user.get('emp_id')
         if not emp_id:
             st.info('No linked employee id')
         else:
-            st.dataframe(pd.read_sql_query('SELECT * FROM performance WHERE emp_id=?', conn, params=(emp_id,)))
+            st.dataframe(get_employee_performance_df(emp_id))
 
 # --- Leaves ---
 elif choice == 'Leaves':
     st.title('Leaves')
-    df_emp = get_employees_df()
-    emp_choice = st.selectbox('Employee', df_emp['emp_id'].tolist()) if user['role']=='admin' else user.get('emp_id')
+    emp_choice = st.selectbox('Employee', get_employee_ids()) if user['role']=='admin' else user.get('emp_id')
     leave_type = st.selectbox('Leave Type', ['Sick', 'Casual', 'Earned'])
     days = st.number_input('Days', min_value=1, value=1)
     if st.button('Apply/Record Leave'):
         add_leave(emp_choice, leave_type, days)
         st.success('Leave recorded')
     st.subheader('All Leaves')
-    st.dataframe(pd.read_sql_query('SELECT l.*, e.name FROM leaves l JOIN employees e ON l.emp_id=e.emp_id', conn))
+    st.dataframe(get_leaves_df())
 
 # --- Attendance ---
 elif choice == 'Attendance':
     st.title('Attendance')
-    df_emp = get_employees_df()
-    emp_choice = st.selectbox('Employee', df_emp['emp_id'].tolist()) if user['role']=='admin' else user.get('emp_id')
+    emp_ids = get_employee_ids() if user['role']=='admin' else []
+    emp_choice = st.selectbox('Employee', emp_ids) if user['role']=='admin' else user.get('emp_id')
     status = st.radio('Status', ['Present', 'Absent'])
     if st.button('Mark Attendance'):
         add_attendance(emp_choice, status)
         st.success('Attendance marked')
+    if emp_ids and st.button(f'Mark All Employees {status}'):
+        add_attendance_bulk([(emp_id, status) for emp_id in emp_ids])
+        st.success(f'Attendance marked for {len(emp_ids)} employees')
     st.subheader('Attendance Records')
-    st.dataframe(pd.read_sql_query('SELECT a.*, e.name FROM attendance a JOIN employees e ON a.emp_id=e.emp_id', conn))
+    st.dataframe(get_attendance_df())
 
 # --- Payroll ---
 elif choice == 'Payroll':
     st.title('Payroll')
-    df_emp = get_employees_df()
     if user['role']=='admin':
-        emp_choice = st.selectbox('Employee', df_emp['emp_id'].tolist())
-        month = st.selectbox('Month', ['January','February','March','April','May','June','July','August','September','October','November','December'])
+        emp_choice = st.selectbox('Employee', get_employee_ids())
+        month = st.selectbox('Month', MONTHS)
         year = st.number_input('Year', min_value=2000, max_value=2100, value=date.today().year)
         basic = st.number_input('Basic Salary', min_value=0.0)
         hra_pct = st.slider('HRA % of Basic', 0.0, 0.5, 0.2)
@@ -524,16 +861,50 @@ elif choice == 'Payroll':
         if st.button('Generate Payroll'):
             pid = generate_payroll(emp_choice, month, int(year), basic, hra_pct, allowances, deductions)
             st.success(f'Payroll generated with id {pid}')
+        if st.button('Generate Payroll for All Employees (basic from employee record, HRA % from slider)'):
+            # allowances/deductions above are for the single employee; nobody already
+            # paid for this month gets a second row
+            emps = get_employees_df()
+            paid = set(get_payroll_month_df(month, int(year))['emp_id'])
+            emps = emps[~emps['emp_id'].isin(paid)]
+            if emps.empty:
+                st.info(f'Payroll for {month} {int(year)} already exists for every employee')
+            else:
+                n = generate_payroll_bulk(month, int(year), emps['emp_id'].to_numpy(), emps['basic_salary'].to_numpy(),
+                                          hra_pct)
+                skipped = f' ({len(paid)} already had one)' if paid else ''
+                st.success(f'Generated {n} payrolls for {month} {int(year)}{skipped}')
         st.subheader('Payroll Records')
         st.dataframe(get_payroll_df())
         st.subheader('Download Payslip (select payroll)')
-        payroll_df = get_payroll_df()
-        if not payroll_df.empty:
-            sel = st.selectbox('Select payroll id', payroll_df['payroll_id'].tolist())
-            pay_row = payroll_df[payroll_df['payroll_id'] == sel].iloc[0].to_dict()
-            emp_row = pd.read_sql_query('SELECT * FROM employees WHERE emp_id=?', conn, params=(pay_row['emp_id'],)).iloc[0].to_dict()
-            pdf_bytes = create_payslip_pdf(emp_row, pay_row)
-            st.download_button('Download Payslip PDF', data=pdf_bytes, file_name=f"payslip_{pay_row['emp_id']}_{pay_row['month']}_{pay_row['year']}.pdf", mime='application/pdf')
+        payroll_ids = get_payroll_ids()
+        if payroll_ids:
+            sel = st.selectbox('Select payroll id', payroll_ids)
+            pay_row = get_payroll(sel)
+            emp_row = get_employee(pay_row['emp_id'])
+            try:
+                pdf_bytes = payslip_pdf(emp_row, pay_row)
+                st.download_button('Download Payslip PDF', data=pdf_bytes, file_name=f"payslip_{pay_row['emp_id']}_{pay_row['month']}_{pay_row['year']}.pdf", mime='application/pdf')
+            except UnicodeEncodeError:
+                st.error('Payslip PDF could not be built: employee details contain characters the PDF font cannot encode')
+
+            st.subheader(f'Bulk Payslips ({month} {int(year)})')
+            month_df = get_payroll_month_df(month, int(year))
+            if month_df.empty:
+                st.info('No payrolls generated for the selected month')
+            else:
+                if st.button(f'Prepare {len(month_df)} payslips'):
+                    emp_lookup = {e['emp_id']: e for e in get_employees_df().to_dict('records')}
+                    rows = [(emp_lookup.get(p['emp_id'], {}), p) for p in month_df.to_dict('records')]
+                    try:
+                        st.session_state['bulk_payslips'] = ((month, int(year)), create_payslips_pdf(rows))
+                    except UnicodeEncodeError:
+                        st.error('Bulk payslips could not be built: some employee details contain characters the PDF font cannot encode')
+                # only offer the PDF that was prepared for the month currently selected
+                prepared = st.session_state.get('bulk_payslips')
+                if prepared and prepared[0] == (month, int(year)):
+                    st.download_button('Download Bulk Payslips PDF', data=prepared[1],
+                                       file_name=f"payslips_{month}_{int(year)}.pdf", mime='application/pdf')
     else:
         emp_id = user.get('emp_id')
         if not emp_id:
@@ -545,9 +916,12 @@ elif choice == 'Payroll':
             if not df.empty:
                 sel_row = st.selectbox('Select payroll', df['payroll_id'].tolist())
                 pr = df[df['payroll_id']==sel_row].iloc[0].to_dict()
-                emp_row = pd.read_sql_query('SELECT * FROM employees WHERE emp_id=?', conn, params=(emp_id,)).iloc[0].to_dict()
-                pdf_bytes = create_payslip_pdf(emp_row, pr)
-                st.download_button('Download Payslip PDF', data=pdf_bytes, file_name=f"payslip_{emp_id}_{pr['month']}_{pr['year']}.pdf", mime='application/pdf')
+                emp_row = get_employee(emp_id)
+                try:
+                    pdf_bytes = payslip_pdf(emp_row, pr)
+                    st.download_button('Download Payslip PDF', data=pdf_bytes, file_name=f"payslip_{emp_id}_{pr['month']}_{pr['year']}.pdf", mime='application/pdf')
+                except UnicodeEncodeError:
+                    st.error('Payslip PDF could not be built: employee details contain characters the PDF font cannot encode')
 
 # --- Users / Admin ---
 elif choice == 'Users':
@@ -556,9 +930,9 @@ elif choice == 'Users':
     else:
         st.title('User Management')
         st.subheader('Create user linked to employee')
-        df_emp = get_employees_df()
-        if not df_emp.empty:
-            emp_choice = st.selectbox('Employee (link user)', df_emp['emp_id'].tolist())
+        emp_ids = get_employee_ids()
+        if emp_ids:
+            emp_choice = st.selectbox('Employee (link user)', emp_ids)
             new_user = st.text_input('Username for employee')
             new_pass = st.text_input('Password', type='password')
             if st.button('Create User for Employee'):
@@ -571,17 +945,21 @@ elif choice == 'Users':
             st.info('Add employees first')
 
         st.subheader('All Users')
-        users_df = pd.read_sql_query('SELECT u.user_id, u.username, u.role, u.emp_id, e.name FROM users u LEFT JOIN employees e ON u.emp_id=e.emp_id', conn)
-        st.dataframe(users_df)
+        pages = max(1, -(-get_user_count() // USERS_PAGE_SIZE))
+        page = st.number_input('Page', min_value=1, max_value=pages, value=1, step=1, key='users_page')
+        st.dataframe(get_users_df(int(page)))
 
         st.subheader('Change user password')
-        sel_username = st.selectbox('Select user to change password', users_df['username'].tolist() if not users_df.empty else [])
+        # typed rather than picked from a list, so the page never loads every username
+        sel_username = st.text_input('Username to change password for', key='pw_user').strip()
         new_password = st.text_input('New password for selected user', type='password')
         if st.button('Change Password'):
-            if new_password and sel_username:
+            if not (new_password and sel_username):
+                st.error('Please enter a username and a new password')
+            elif not user_exists(sel_username):
+                st.error(f"No user named '{sel_username}'")
+            else:
                 update_user_password(sel_username, new_password)
                 st.success(f"Password updated for user '{sel_username}'")
-            else:
-                st.error('Please select a user and enter a new password')
 
 # End of app